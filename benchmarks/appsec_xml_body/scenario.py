@@ -0,0 +1,28 @@
+import bm
+
+from ddtrace.appsec import handlers
+
+
+def _xml_body(nitems):
+    items = "".join('<item id="%d"><name>name %d</name><value>value</value></item>' % (i, i) for i in range(nitems))
+    return ('<?xml version="1.0" encoding="UTF-8"?><root>%s</root>' % items).encode("UTF-8")
+
+
+class AppSecXmlBody(bm.Scenario):
+    nitems = bm.var(type=int)
+    lxml = bm.var_bool()
+
+    def run(self):
+        body = _xml_body(self.nitems)
+        lxml_etree = handlers.lxml_etree
+        if not self.lxml:
+            # parse with xmltodict, as done when lxml is not installed
+            handlers.lxml_etree = None
+        parse_xml_data = handlers._parse_xml_data
+
+        def _(loops):
+            for _ in range(loops):
+                parse_xml_data(body)
+
+        yield _
+        handlers.lxml_etree = lxml_etree
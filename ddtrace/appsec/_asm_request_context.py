@@ -1,5 +1,4 @@
 import contextlib
-import functools
 from typing import TYPE_CHECKING
 
 from ddtrace import config
@@ -16,7 +15,7 @@ from ddtrace.internal.logger import get_logger
 if TYPE_CHECKING:
     from typing import Any
     from typing import Callable
-    from typing import Generator
+    from typing import Dict
     from typing import List
     from typing import Optional
     from typing import Tuple
@@ -37,6 +36,7 @@ _TELEMETRY = "telemetry"
 _CONTEXT_CALL = "context"
 _WAF_CALL = "waf_run"
 _BLOCK_CALL = "block"
+_BLOCK_CALL_ARGS = "block_args"
 _WAF_RESULTS = "waf_results"
 
 
@@ -58,13 +58,22 @@ class ASM_Environment:
         self.callbacks = {}  # type: dict[str, Any]
         self.telemetry = {}  # type: dict[str, Any]
         self.addresses_sent = set()  # type: set[str]
+        # whether a WAF address was set since the last complete WAF run
+        self.waf_addresses_updated = False
+        # version of the addresses kept by the ASM processor at the last complete WAF run
+        self.addresses_to_keep_version = 0
 
 
-def _get_asm_context():
-    env = core.get_item("asm_env")
+# The ASM_Environment of the current request is kept in its own ContextVar so it can be retrieved
+# with a single lookup instead of walking the core execution contexts for every address operation.
+_ASM_ENV = contextvars.ContextVar("asm_env", default=None)  # type: contextvars.ContextVar[Optional[ASM_Environment]]
+
+
+def _get_asm_context():  # type: () -> ASM_Environment
+    env = _ASM_ENV.get()
     if env is None:
         env = ASM_Environment()
-        core.set_item("asm_env", env)
+        _ASM_ENV.set(env)
     return env
 
 
@@ -122,36 +131,48 @@ class _DataHandler:
 
         self._id = _DataHandler.main_id
         self.active = True
-        self.execution_context = core.ExecutionContext(__name__, **{"asm_env": env})
+        self.env = env
+        self.execution_context = core.ExecutionContext(__name__)
+        self._env_token = _ASM_ENV.set(env)
 
         env.telemetry[_WAF_RESULTS] = [], [], []
         env.callbacks[_CONTEXT_CALL] = []
 
     def finalise(self):
         if self.active:
-            env = self.execution_context.get_item("asm_env")
+            env = self.env
             # assert _CONTEXT_ID.get() == self._id
             callbacks = GLOBAL_CALLBACKS.get(_CONTEXT_CALL, []) + env.callbacks.get(_CONTEXT_CALL)
             if callbacks is not None:
                 for function in callbacks:
                     function(env)
                 self.execution_context.end()
+            try:
+                _ASM_ENV.reset(self._env_token)
+            except ValueError:
+                # the context was finished in a Context other than the one that started it
+                _ASM_ENV.set(None)
             self.active = False
 
 
 def set_value(category, address, value):  # type: (str, str, Any) -> None
-    env = _get_asm_context()
+    _set_env_value(_get_asm_context(), category, address, value)
+
+
+def _set_env_value(env, category, address, value):  # type: (ASM_Environment, str, str, Any) -> None
     if not env.active:
         log.debug("setting %s address %s with no active asm context", category, address)
         return
     asm_context_attr = getattr(env, category, None)
     if asm_context_attr is not None:
         asm_context_attr[address] = value
+        if category == _WAF_ADDRESSES:
+            env.waf_addresses_updated = True
 
 
 def set_headers_response(headers):  # type: (Any) -> None
     if headers is not None:
-        set_waf_address(SPAN_DATA_NAMES.RESPONSE_HEADERS_NO_COOKIES, headers, _get_asm_context().span)
+        set_waf_address(SPAN_DATA_NAMES.RESPONSE_HEADERS_NO_COOKIES, headers)
 
 
 def set_body_response(body_response):
@@ -165,19 +186,34 @@ def set_body_response(body_response):
 
 
 def set_waf_address(address, value, span=None):  # type: (str, Any, Any) -> None
+    env = _get_asm_context()
     if address == SPAN_DATA_NAMES.REQUEST_URI_RAW:
         parse_address = parse.urlparse(value)
         no_scheme = parse.ParseResult("", "", *parse_address[2:])
         waf_value = parse.urlunparse(no_scheme)
-        set_value(_WAF_ADDRESSES, address, waf_value)
+        _set_env_value(env, _WAF_ADDRESSES, address, waf_value)
     else:
-        set_value(_WAF_ADDRESSES, address, value)
+        _set_env_value(env, _WAF_ADDRESSES, address, value)
     if span is None:
-        span = _get_asm_context().span
+        span = env.span
     if span:
         core.set_item(address, value, span=span)
 
 
+def set_waf_addresses(addresses, span=None):  # type: (Dict[str, Any], Any) -> None
+    """
+    Sets several WAF addresses at once, looking up the ASM context and its span only once.
+    Unlike set_waf_address, the values are stored as given (the raw URI is not stripped of its scheme).
+    """
+    env = _get_asm_context()
+    for address, value in addresses.items():
+        _set_env_value(env, _WAF_ADDRESSES, address, value)
+    if span is None:
+        span = env.span
+    if span:
+        core.set_items(addresses, span=span)
+
+
 def get_value(category, address, default=None):  # type: (str, str, Any) -> Any
     env = _get_asm_context()
     if not env.active:
@@ -236,7 +272,7 @@ def call_waf_callback(custom_data=None):
 
 def set_ip(ip):  # type: (Optional[str]) -> None
     if ip is not None:
-        set_waf_address(SPAN_DATA_NAMES.REQUEST_HTTP_IP, ip, _get_asm_context().span)
+        set_waf_address(SPAN_DATA_NAMES.REQUEST_HTTP_IP, ip)
 
 
 def get_ip():  # type: () -> Optional[str]
@@ -250,7 +286,7 @@ def get_ip():  # type: () -> Optional[str]
 
 def set_headers(headers):  # type: (Any) -> None
     if headers is not None:
-        set_waf_address(SPAN_DATA_NAMES.REQUEST_HEADERS_NO_COOKIES, headers, _get_asm_context().span)
+        set_waf_address(SPAN_DATA_NAMES.REQUEST_HEADERS_NO_COOKIES, headers)
 
 
 def get_headers():  # type: () -> Optional[Any]
@@ -258,21 +294,22 @@ def get_headers():  # type: () -> Optional[Any]
 
 
 def set_headers_case_sensitive(case_sensitive):  # type: (bool) -> None
-    set_waf_address(SPAN_DATA_NAMES.REQUEST_HEADERS_NO_COOKIES_CASE, case_sensitive, _get_asm_context().span)
+    set_waf_address(SPAN_DATA_NAMES.REQUEST_HEADERS_NO_COOKIES_CASE, case_sensitive)
 
 
 def get_headers_case_sensitive():  # type: () -> bool
     return get_value(_WAF_ADDRESSES, SPAN_DATA_NAMES.REQUEST_HEADERS_NO_COOKIES_CASE, False)  # type : ignore
 
 
-def set_block_request_callable(_callable):  # type: (Optional[Callable]) -> None
+def set_block_request_callable(_callable, *args):  # type: (Optional[Callable], Any) -> None
     """
     Sets a callable that could be use to do a best-effort to block the request. If
-    the callable need any params, like headers, they should be curried with
-    functools.partial.
+    the callable need any params, like headers, they should be given as extra
+    positional arguments.
     """
     if _callable:
         set_value(_CALLBACKS, _BLOCK_CALL, _callable)
+        set_value(_CALLBACKS, _BLOCK_CALL_ARGS, args)
 
 
 def block_request():  # type: () -> None
@@ -281,7 +318,7 @@ def block_request():  # type: () -> None
     """
     _callable = get_value(_CALLBACKS, _BLOCK_CALL)
     if _callable:
-        _callable()
+        _callable(*get_value(_CALLBACKS, _BLOCK_CALL_ARGS, ()))
     else:
         log.debug("Block request called but block callable not set by framework")
 
@@ -294,16 +331,37 @@ def get_data_sent():  # type: () -> set[str] | None
     return env.addresses_sent
 
 
+def consume_waf_addresses_updated(addresses_to_keep_version=0):  # type: (int) -> bool
+    """
+    Returns whether a WAF address was set or the addresses kept by the ASM processor changed
+    since the last call, and resets the flag.
+    """
+    env = _get_asm_context()
+    updated = env.waf_addresses_updated or env.addresses_to_keep_version != addresses_to_keep_version
+    env.waf_addresses_updated = False
+    env.addresses_to_keep_version = addresses_to_keep_version
+    return updated
+
+
 def asm_request_context_set(remote_ip=None, headers=None, headers_case_sensitive=False, block_request_callable=None):
     # type: (Optional[str], Any, bool, Optional[Callable]) -> None
-    set_ip(remote_ip)
-    set_headers(headers)
-    set_headers_case_sensitive(headers_case_sensitive)
+    addresses = {}  # type: Dict[str, Any]
+    if remote_ip is not None:
+        addresses[SPAN_DATA_NAMES.REQUEST_HTTP_IP] = remote_ip
+    if headers is not None:
+        addresses[SPAN_DATA_NAMES.REQUEST_HEADERS_NO_COOKIES] = headers
+    addresses[SPAN_DATA_NAMES.REQUEST_HEADERS_NO_COOKIES_CASE] = headers_case_sensitive
+    set_waf_addresses(addresses)
     set_block_request_callable(block_request_callable)
 
 
 def set_waf_results(result_data, result_info, is_blocked):  # type: (Any, Any, bool) -> None
-    three_lists = get_waf_results()
+    # called after every WAF run: read the telemetry of the environment directly
+    env = _get_asm_context()
+    if not env.active:
+        log.debug("setting waf results with no active asm context")
+        return
+    three_lists = env.telemetry.get(_WAF_RESULTS)
     if three_lists is not None:
         list_results_data, list_result_info, list_is_blocked = three_lists
         list_results_data.append(result_data)
@@ -319,22 +377,44 @@ def reset_waf_results():  # type: () -> None
     set_value(_TELEMETRY, _WAF_RESULTS, ([], [], []))
 
 
-@contextlib.contextmanager
+class _AsmRequestContextManager(object):
+    """
+    The ASM context manager. A plain class is used instead of
+    contextlib.contextmanager as it is entered once per request.
+    """
+
+    __slots__ = ("remote_ip", "headers", "headers_case_sensitive", "block_request_callable", "resources")
+
+    def __init__(self, remote_ip, headers, headers_case_sensitive, block_request_callable):
+        # type: (Optional[str], Any, bool, Optional[Callable]) -> None
+        self.remote_ip = remote_ip
+        self.headers = headers
+        self.headers_case_sensitive = headers_case_sensitive
+        self.block_request_callable = block_request_callable
+        self.resources = None  # type: Optional[_DataHandler]
+
+    def __enter__(self):
+        # type: () -> Optional[_DataHandler]
+        self.resources = _start_context(
+            self.remote_ip, self.headers, self.headers_case_sensitive, self.block_request_callable
+        )
+        return self.resources
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # type: (Any, Any, Any) -> None
+        resources, self.resources = self.resources, None
+        if resources is not None:
+            _end_context(resources)
+
+
 def asm_request_context_manager(
     remote_ip=None, headers=None, headers_case_sensitive=False, block_request_callable=None
 ):
-    # type: (Optional[str], Any, bool, Optional[Callable]) -> Generator[_DataHandler|None, None, None]
+    # type: (Optional[str], Any, bool, Optional[Callable]) -> _AsmRequestContextManager
     """
     The ASM context manager
     """
-    resources = _start_context(remote_ip, headers, headers_case_sensitive, block_request_callable)
-    if resources is not None:
-        try:
-            yield resources
-        finally:
-            _end_context(resources)
-    else:
-        yield None
+    return _AsmRequestContextManager(remote_ip, headers, headers_case_sensitive, block_request_callable)
 
 
 def _start_context(remote_ip, headers, headers_case_sensitive, block_request_callable):
@@ -346,9 +426,6 @@ def _start_context(remote_ip, headers, headers_case_sensitive, block_request_cal
         return resources
 
 
-RESOURCES = contextvars.ContextVar("asm_resources")  # type: contextvars.ContextVar[Optional[_DataHandler]]
-
-
 def _on_context_started(ctx):
     resources = _start_context(
         ctx.get_item("remote_addr"),
@@ -356,22 +433,19 @@ def _on_context_started(ctx):
         ctx.get_item("headers_case_sensitive"),
         ctx.get_item("block_request_callable"),
     )
-    token = RESOURCES.set(resources)
-    ctx.set_item("token_resources", token)
+    # the _DataHandler already holds the token restoring the previous ASM_Environment:
+    # keep it on the execution context instead of setting another ContextVar
+    ctx.set_item("asm_resources", resources)
 
 
 def _end_context(resources):
     resources.finalise()
-    core.set_item("asm_env", None)
 
 
 def _on_context_ended(ctx):
-    resources = RESOURCES.get()
+    resources = ctx.get_item("asm_resources")
     if resources is not None:
         _end_context(resources)
-        token = ctx.get_item("token_resources")
-        if token:
-            RESOURCES.reset(token)
 
 
 core.on("context.started.wsgi.__call__", _on_context_started)
@@ -395,12 +469,11 @@ def _on_wrapped_view(kwargs):
         from ddtrace.appsec.iast._taint_tracking import OriginType
         from ddtrace.appsec.iast._taint_tracking import taint_pyobject
 
-        _kwargs = {}
-        for k, v in kwargs.items():
-            _kwargs[k] = taint_pyobject(
-                pyobject=v, source_name=k, source_value=v, source_origin=OriginType.PATH_PARAMETER
-            )
-        return_value[1] = _kwargs
+        origin = OriginType.PATH_PARAMETER
+        return_value[1] = {
+            k: taint_pyobject(pyobject=v, source_name=k, source_value=v, source_origin=origin)
+            for k, v in kwargs.items()
+        }
     return return_value
 
 
@@ -408,7 +481,7 @@ def _on_pre_tracedrequest(ctx):
     block_request_callable = ctx.get_item("block_request_callable")
     current_span = ctx.get_item("current_span")
     if config._appsec_enabled:
-        set_block_request_callable(functools.partial(block_request_callable, current_span))
+        set_block_request_callable(block_request_callable, current_span)
         if core.get_item(WAF_CONTEXT_NAMES.BLOCKED):
             block_request()
 
@@ -423,6 +496,9 @@ def _on_post_finalizerequest(rv):
 def _on_start_response():
     log.debug("Flask WAF call for Suspicious Request Blocking on response")
     call_waf_callback()
+    # the Accept header is only needed to pick the content type of a blocking response
+    if not core.get_item(WAF_CONTEXT_NAMES.BLOCKED):
+        return None
     return get_headers().get("Accept", "").lower()
 
 
@@ -431,6 +507,9 @@ def _on_block_decided(callback):
 
 
 def listen_context_handlers():
+    # see handlers.listen: "flask.start_response" is only listened to by AppSec
+    if core.has_listeners("flask.start_response"):
+        return
     core.on("flask.finalize_request.post", _on_post_finalizerequest)
     core.on("flask.wrapped_view", _on_wrapped_view)
     core.on("context.started.flask._traced_request", _on_pre_tracedrequest)
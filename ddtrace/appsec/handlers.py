@@ -1,7 +1,9 @@
 import functools
 import json
+import threading
 
 from six import BytesIO
+from six import string_types
 import xmltodict
 
 from ddtrace import config
@@ -22,8 +24,25 @@ except ImportError:
     # handling python 2.X import error
     JSONDecodeError = ValueError  # type: ignore
 
+try:
+    from orjson import loads as orjson_loads
+except ImportError:
+    # orjson is optional, the standard library is used when it is not installed
+    orjson_loads = None
+
+try:
+    from lxml import etree as lxml_etree
+
+    XMLSyntaxError = lxml_etree.XMLSyntaxError
+except ImportError:
+    # lxml is optional, xmltodict is used when it is not installed
+    lxml_etree = None
+    XMLSyntaxError = xmltodict.expat.ExpatError  # type: ignore
+
 log = get_logger(__name__)
-_BODY_METHODS = {"POST", "PUT", "DELETE", "PATCH"}
+_BODY_METHODS = frozenset(("POST", "PUT", "DELETE", "PATCH"))
+# lxml parsers can't be shared between threads, each thread keeps its own
+_LXML_PARSERS = threading.local()
 
 
 def _on_set_request_tags(request, span, flask_config):
@@ -41,54 +60,172 @@ def _on_set_request_tags(request, span, flask_config):
         )
 
 
+def _parse_json_data(data, errors="strict"):
+    """Parse a raw JSON request body, shared by the framework integrations"""
+    if orjson_loads is not None:
+        try:
+            # orjson parses bytes directly, without decoding them first
+            return orjson_loads(data)
+        except ValueError:
+            # orjson is stricter than the standard library (NaN, integers over 64 bits...): fall back to it
+            # so such payloads are still inspected by the WAF
+            pass
+    return json.loads(data.decode("UTF-8", errors))
+
+
+def _parse_json_body(request, has_json_mixin):
+    # request.json is a property: only evaluate it once
+    body_json = getattr(request, "json", None) if has_json_mixin else None
+    if body_json:
+        return body_json
+    return _parse_json_data(request.data)
+
+
+_XML_NAMESPACE = "http://www.w3.org/XML/1998/namespace"
+
+
+def _lxml_tag_name(element):
+    """Rebuild the tag name of an lxml element as written in the document"""
+    tag = element.tag
+    if not tag.startswith("{"):
+        return tag
+    local_name = tag.split("}", 1)[1]
+    return element.prefix + ":" + local_name if element.prefix else local_name
+
+
+def _lxml_attribute_name(name, namespaces):
+    """Rebuild the name of an lxml attribute as written in the document"""
+    if not name.startswith("{"):
+        return name
+    uri, local_name = name[1:].split("}", 1)
+    if uri == _XML_NAMESPACE:
+        return "xml:" + local_name
+    for prefix, prefix_uri in namespaces.items():
+        if prefix and prefix_uri == uri:
+            return prefix + ":" + local_name
+    return local_name
+
+
+def _lxml_to_dict(element, parent_namespaces):
+    """
+    Convert an lxml element to the structure xmltodict.parse builds with its
+    default options, so the WAF gets the same data whichever parser is used.
+    """
+    item = {}
+    namespaces = element.nsmap
+    for prefix, uri in namespaces.items():
+        if parent_namespaces.get(prefix) != uri:
+            item["@xmlns:" + prefix if prefix else "@xmlns"] = uri
+    for name, value in element.attrib.items():
+        item["@" + _lxml_attribute_name(name, namespaces)] = value
+
+    texts = [element.text] if element.text else []
+    for child in element:
+        # entities don't have a string tag, comments and processing instructions are removed by the parser
+        if isinstance(child.tag, string_types):
+            name = _lxml_tag_name(child)
+            value = _lxml_to_dict(child, namespaces)
+            if name in item:
+                existing = item[name]
+                if isinstance(existing, list):
+                    existing.append(value)
+                else:
+                    item[name] = [existing, value]
+            else:
+                item[name] = value
+        if child.tail:
+            texts.append(child.tail)
+
+    data = "".join(texts).strip()
+    if not item:
+        return data or None
+    if data:
+        item["#text"] = data
+    return item
+
+
+def _get_lxml_parser():
+    parser = getattr(_LXML_PARSERS, "parser", None)
+    if parser is None:
+        # entities are not resolved and the network is never accessed
+        parser = _LXML_PARSERS.parser = lxml_etree.XMLParser(
+            resolve_entities=False, no_network=True, remove_comments=True, remove_pis=True
+        )
+    return parser
+
+
+def _parse_xml_data(data, errors="strict"):
+    """Parse a raw XML request body, shared by the framework integrations"""
+    if errors != "strict":
+        # the bytes that are not valid UTF-8 are handled according to errors instead of failing the parsing
+        data = data.decode("UTF-8", errors).encode("UTF-8")
+    if lxml_etree is None:
+        return xmltodict.parse(data)
+    root = lxml_etree.fromstring(data, _get_lxml_parser())
+    return {_lxml_tag_name(root): _lxml_to_dict(root, {})}
+
+
+def _parse_xml_body(request, has_json_mixin):
+    return _parse_xml_data(request.get_data())
+
+
+_BODY_PARSE_ERRORS = (
+    AttributeError,
+    RuntimeError,
+    TypeError,
+    ValueError,
+    JSONDecodeError,
+    XMLSyntaxError,
+    xmltodict.expat.ExpatError,
+    xmltodict.ParsingInterrupted,
+)
+
+_BODY_PARSERS = {
+    "application/json": _parse_json_body,
+    "text/json": _parse_json_body,
+    "application/xml": _parse_xml_body,
+    "text/xml": _parse_xml_body,
+}
+
+
 def _on_request_span_modifier(request, environ, _HAS_JSON_MIXIN, exception_type):
-    req_body = None
-    if config._appsec_enabled and request.method in _BODY_METHODS:
-        content_type = request.content_type
-        wsgi_input = environ.get("wsgi.input", "")
+    if not config._appsec_enabled:
+        return None
+    if request.method not in _BODY_METHODS:
+        return None
 
-        # Copy wsgi input if not seekable
-        if wsgi_input:
-            try:
-                seekable = wsgi_input.seekable()
-            except AttributeError:
-                seekable = False
-            if not seekable:
-                content_length = int(environ.get("CONTENT_LENGTH", 0))
-                body = wsgi_input.read(content_length) if content_length else wsgi_input.read()
-                environ["wsgi.input"] = BytesIO(body)
+    req_body = None
+    content_type = request.content_type
+    wsgi_input = environ.get("wsgi.input", "")
 
+    # Copy wsgi input if not seekable
+    if wsgi_input:
         try:
-            if content_type == "application/json" or content_type == "text/json":
-                if _HAS_JSON_MIXIN and hasattr(request, "json") and request.json:
-                    req_body = request.json
-                else:
-                    req_body = json.loads(request.data.decode("UTF-8"))
-            elif content_type in ("application/xml", "text/xml"):
-                req_body = xmltodict.parse(request.get_data())
-            elif hasattr(request, "form"):
-                req_body = request.form.to_dict()
-            else:
-                # no raw body
-                req_body = None
-        except (
-            exception_type,
-            AttributeError,
-            RuntimeError,
-            TypeError,
-            ValueError,
-            JSONDecodeError,
-            xmltodict.expat.ExpatError,
-            xmltodict.ParsingInterrupted,
-        ):
-            log.warning("Failed to parse request body", exc_info=True)
-        finally:
-            # Reset wsgi input to the beginning
-            if wsgi_input:
-                if seekable:
-                    wsgi_input.seek(0)
-                else:
-                    environ["wsgi.input"] = BytesIO(body)
+            seekable = wsgi_input.seekable()
+        except AttributeError:
+            seekable = False
+        if not seekable:
+            content_length = int(environ.get("CONTENT_LENGTH", 0))
+            body = wsgi_input.read(content_length) if content_length else wsgi_input.read()
+            # The copy is seekable, so it is rewound once the body is parsed instead of being
+            # copied again, and later calls for the same request will not read the body again
+            wsgi_input = environ["wsgi.input"] = BytesIO(body)
+
+    try:
+        body_parser = _BODY_PARSERS.get(content_type)
+        if body_parser is not None:
+            req_body = body_parser(request, _HAS_JSON_MIXIN)
+        elif hasattr(request, "form"):
+            req_body = request.form.to_dict()
+        else:
+            # no raw body
+            req_body = None
+    except (exception_type,) + _BODY_PARSE_ERRORS:
+        log.warning("Failed to parse request body", exc_info=True)
+    finally:
+        # Reset wsgi input to the beginning
+        if wsgi_input:
+            wsgi_input.seek(0)
     return req_body
 
 
@@ -249,6 +386,10 @@ def _on_django_patch():
 
 
 def listen():
+    # called for every request: the listeners are registered together, so once the last one is
+    # found the others are too and the linear lookups of core.on can be skipped
+    if core.has_listeners("flask.request_span_modifier"):
+        return
     core.on("flask.set_request_tags", _on_set_request_tags)
     core.on("flask.request_span_modifier", _on_request_span_modifier)
 
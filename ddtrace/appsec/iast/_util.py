@@ -14,16 +14,19 @@ if TYPE_CHECKING:
     from typing import Tuple
 
 
+# IAST supports Python versions 3.6 to 3.11
+_PYTHON_VERSION_SUPPORTED = (3, 6, 0) <= sys.version_info < (3, 12, 0)
+
+
 def _is_python_version_supported():  # type: () -> bool
-    # IAST supports Python versions 3.6 to 3.11
-    return (3, 6, 0) <= sys.version_info < (3, 12, 0)
+    return _PYTHON_VERSION_SUPPORTED
 
 
 def _is_iast_enabled():
     if not config._iast_enabled:
         return False
 
-    if not _is_python_version_supported():
+    if not _PYTHON_VERSION_SUPPORTED:
         log = get_logger(__name__)
         log.info("IAST is not compatible with the current Python version")
         return False
@@ -46,6 +46,7 @@ if TYPE_CHECKING:  # pragma: no cover
     from typing import Any
     from typing import Dict
     from typing import List
+    from typing import Optional
     from typing import Tuple
     from typing import Union
 
@@ -56,22 +57,40 @@ if TYPE_CHECKING:  # pragma: no cover
 log = get_logger(__name__)
 
 
+# Applications receive the same header names over and over: cache their lowercase version,
+# or None for the headers that are never sent to the WAF
+_LOWER_HEADERS_CACHE = {}  # type: Dict[str, Optional[str]]
+_LOWER_HEADERS_CACHE_MAX_SIZE = 512
+_SKIPPED_HEADERS = frozenset(("cookie", "set-cookie"))
+
+
 def _transform_headers(data):
     # type: (Union[Dict[str, str], List[Tuple[str, str]]]) -> Dict[str, Union[str, List[str]]]
     normalized = {}  # type: Dict[str, Union[str, List[str]]]
     headers = data if isinstance(data, list) else data.items()
     for header, value in headers:
-        header = header.lower()
-        if header in ("cookie", "set-cookie"):
+        try:
+            lower_header = _LOWER_HEADERS_CACHE[header]
+        except KeyError:
+            if len(_LOWER_HEADERS_CACHE) >= _LOWER_HEADERS_CACHE_MAX_SIZE:
+                _LOWER_HEADERS_CACHE.clear()
+            lower_header = header.lower()
+            if lower_header in _SKIPPED_HEADERS:
+                lower_header = None
+            _LOWER_HEADERS_CACHE[header] = lower_header
+        if lower_header is None:
             continue
-        if header in normalized:  # if a header with the same lowercase name already exists, let's make it an array
+        header = lower_header
+        try:
             existing = normalized[header]
-            if isinstance(existing, list):
-                existing.append(value)
-            else:
-                normalized[header] = [existing, value]
-        else:
+        except KeyError:
             normalized[header] = value
+            continue
+        # if a header with the same lowercase name already exists, let's make it an array
+        if isinstance(existing, list):
+            existing.append(value)
+        else:
+            normalized[header] = [existing, value]
     return normalized
 
 
@@ -143,6 +162,8 @@ class AppSecSpanProcessor(SpanProcessor):
     obfuscation_parameter_value_regexp = attr.ib(type=bytes, factory=get_appsec_obfuscation_parameter_value_regexp)
     _ddwaf = attr.ib(type=DDWaf, default=None)
     _addresses_to_keep = attr.ib(type=Set[str], factory=set)
+    # incremented each time an address is added to _addresses_to_keep
+    _addresses_to_keep_version = attr.ib(type=int, default=0)
     _rate_limiter = attr.ib(type=RateLimiter, factory=_get_rate_limiter)
 
     @property
@@ -211,6 +232,10 @@ class AppSecSpanProcessor(SpanProcessor):
             error_msg = "Error updating ASM rules. Invalid rules"
             log.debug(error_msg)
             _set_waf_error_metric(error_msg, "", self._ddwaf.info)
+        else:
+            # the new rules may need addresses that were not needed before
+            for address in self._ddwaf.required_data:
+                self._mark_needed(address)
         return result
 
     def on_span_start(self, span):
@@ -276,19 +301,28 @@ class AppSecSpanProcessor(SpanProcessor):
             return
 
         data = {}
-        iter_data = [(key, WAF_DATA_NAMES[key]) for key in custom_data] if custom_data is not None else WAF_DATA_NAMES
+        if custom_data is not None:
+            iter_data = [(key, WAF_DATA_NAMES[key]) for key in custom_data]
+        elif _asm_request_context.consume_waf_addresses_updated(self._addresses_to_keep_version):
+            iter_data = WAF_DATA_NAMES
+        else:
+            # no address was set nor became needed since the last complete run, there is nothing new to look for
+            iter_data = ()
         data_already_sent = _asm_request_context.get_data_sent()
         if data_already_sent is None:
             data_already_sent = set()
 
+        # fetch the addresses once instead of going through the ASM context for each of them
+        waf_addresses = _asm_request_context.get_waf_addresses({})
+        addresses_to_keep = self._addresses_to_keep
+
         # type ignore because mypy seems to not detect that both results of the if
         # above can iter if not None
         for key, waf_name in iter_data:  # type: ignore[attr-defined]
-            if self._is_needed(waf_name) and key not in data_already_sent:
-                if custom_data is not None and custom_data.get(key) is not None:
-                    value = custom_data.get(key)
-                else:
-                    value = _asm_request_context.get_value("waf_addresses", SPAN_DATA_NAMES[key])
+            if waf_name in addresses_to_keep and key not in data_already_sent:
+                value = custom_data.get(key) if custom_data is not None else None
+                if value is None:
+                    value = waf_addresses.get(SPAN_DATA_NAMES[key])
 
                 if value:
                     data[waf_name] = _transform_headers(value) if key.endswith("HEADERS_NO_COOKIES") else value
@@ -375,7 +409,10 @@ class AppSecSpanProcessor(SpanProcessor):
 
     def _mark_needed(self, address):
         # type: (str) -> None
-        self._addresses_to_keep.add(address)
+        if address not in self._addresses_to_keep:
+            self._addresses_to_keep.add(address)
+            # addresses already set in a running request but not sent yet must be looked up again
+            self._addresses_to_keep_version += 1
 
     def _is_needed(self, address):
         # type: (str) -> bool
@@ -30,6 +30,7 @@ class BaseLLMIntegration:
         # object that is strongly linked with configuration.
         self._statsd = get_dogstatsd_client(stats_url, namespace=self._integration_name)
         self._config = config
+        self._request_span_name = "%s.request" % self._integration_name
         self._log_writer = V2LogWriter(
             site=site,
             api_key=api_key,
@@ -68,9 +69,7 @@ class BaseLLMIntegration:
         Reuse the service of the application since we'll tag downstream request spans with the LLM name.
         Eventually those should also be internal service spans once peer.service is implemented.
         """
-        span = pin.tracer.trace(
-            "%s.request" % self._integration_name, resource=operation_id, service=int_service(pin, self._config)
-        )
+        span = pin.tracer.trace(self._request_span_name, resource=operation_id, service=int_service(pin, self._config))
         # Enable trace metrics for these spans so users can see per-service openai usage in APM.
         span.set_tag(SPAN_MEASURED_KEY)
         self._set_base_span_tags(span, **kwargs)
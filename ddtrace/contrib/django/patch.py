@@ -6,7 +6,6 @@ Django internals are instrumented via normal `patch()`.
 `django.apps.registry.Apps.populate` is patched to add instrumentation for any
 specific Django apps like Django Rest Framework (DRF).
 """
-import functools
 from inspect import getmro
 from inspect import isclass
 from inspect import isfunction
@@ -446,9 +445,7 @@ def traced_get_response(django, pin, func, instance, args, kwargs):
             service=trace_utils.int_service(pin, config.django),
             span_type=SpanTypes.WEB,
         ) as span:
-            _asm_request_context.set_block_request_callable(
-                functools.partial(_block_request_callable, request, request_headers, span)
-            )
+            _asm_request_context.set_block_request_callable(_block_request_callable, request, request_headers, span)
             span.set_tag_str(COMPONENT, config.django.integration_name)
 
             # set span.kind to the type of request being performed
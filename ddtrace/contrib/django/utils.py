@@ -1,4 +1,3 @@
-import json
 from typing import Any
 from typing import Dict
 from typing import List
@@ -9,7 +8,6 @@ from typing import Union
 import django
 from django.utils.functional import SimpleLazyObject
 import six
-import xmltodict
 
 from ddtrace import config
 from ddtrace.constants import ANALYTICS_SAMPLE_RATE_KEY
@@ -45,7 +43,7 @@ else:
 DJANGO22 = django.VERSION >= (2, 2, 0)
 
 REQUEST_DEFAULT_RESOURCE = "__django_request"
-_BODY_METHODS = {"POST", "PUT", "DELETE", "PATCH"}
+_BODY_METHODS = frozenset(("POST", "PUT", "DELETE", "PATCH"))
 
 _quantize_text = Union[Text, bytes]
 _quantize_param = Union[_quantize_text, List[_quantize_text], Dict[_quantize_text, Any], Any]
@@ -263,6 +261,8 @@ def _before_request_tags(pin, span, request):
 def _extract_body(request):
     # DEV: Do not use request.POST or request.data, this could prevent custom parser to be used after
     if config._appsec_enabled and request.method in _BODY_METHODS:
+        from ddtrace.appsec.handlers import _parse_json_data
+        from ddtrace.appsec.handlers import _parse_xml_data
         from ddtrace.appsec.utils import parse_form_multipart
         from ddtrace.appsec.utils import parse_form_params
 
@@ -274,9 +274,9 @@ def _extract_body(request):
             elif content_type == "multipart/form-data":
                 req_body = parse_form_multipart(request.body.decode("UTF-8", errors="ignore"))
             elif content_type in ("application/json", "text/json"):
-                req_body = json.loads(request.body.decode("UTF-8", errors="ignore"))
+                req_body = _parse_json_data(request.body, errors="ignore")
             elif content_type in ("application/xml", "text/xml"):
-                req_body = xmltodict.parse(request.body.decode("UTF-8", errors="ignore"))
+                req_body = _parse_xml_data(request.body, errors="ignore")
             else:  # text/plain, others: don't use them
                 req_body = None
         except BaseException:
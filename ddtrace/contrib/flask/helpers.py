@@ -10,7 +10,9 @@ from .. import trace_utils
 def get_current_app():
     """Helper to get the flask.app.Flask from the current app context"""
     try:
-        return flask.current_app
+        # DEV: resolve the proxy once, the pin lookups on the returned app then do not go
+        #      through the app context stack for every attribute access
+        return flask.current_app._get_current_object()
     except RuntimeError:
         # raised if current_app is None: https://github.com/pallets/flask/blob/2.1.3/src/flask/globals.py#L40
         pass
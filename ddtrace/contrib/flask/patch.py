@@ -1,3 +1,5 @@
+from typing import TYPE_CHECKING
+
 import flask
 import werkzeug
 from werkzeug.exceptions import BadRequest
@@ -16,6 +18,12 @@ from ...internal.schema import schematize_url_operation
 from ...internal.utils import http as http_utils
 
 
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Any
+    from typing import List
+    from typing import Tuple
+
+
 # Not all versions of flask/werkzeug have this mixin
 try:
     from werkzeug.wrappers.json import JSONMixin
@@ -26,6 +34,7 @@ except ImportError:
 
 from ddtrace import Pin
 from ddtrace import config
+from ddtrace.vendor.wrapt import resolve_path
 from ddtrace.vendor.wrapt import wrap_function_wrapper as _w
 
 from .. import trace_utils
@@ -59,7 +68,6 @@ except ImportError:
 log = get_logger(__name__)
 
 FLASK_VERSION = "flask.version"
-_BODY_METHODS = {"POST", "PUT", "DELETE", "PATCH"}
 
 # Configure default configuration
 config._add(
@@ -99,8 +107,46 @@ else:
 flask_version_str = getattr(flask, "__version__", "0.0.0")
 flask_version = parse_version(flask_version_str)
 
+# flask.app.Flask traced hook decorators
+_FLASK_HOOKS = tuple(
+    "Flask." + hook
+    for hook in ("before_request", "after_request", "teardown_request", "teardown_appcontext")
+    + (("before_first_request",) if flask_version < (2, 3, 0) else ())
+)
+
+# flask.app.Flask traced methods, with their span names
+_FLASK_APP_TRACES = tuple(
+    ("Flask." + name, "flask." + name)
+    for name in (
+        "process_response",
+        "handle_exception",
+        "handle_http_exception",
+        "handle_user_exception",
+        "do_teardown_request",
+        "do_teardown_appcontext",
+        "send_static_file",
+    )
+    + (("try_trigger_before_first_request_functions",) if flask_version < (2, 2, 0) else ())
+)
+
+# flask.blueprints.Blueprint traced hook decorators
+_BLUEPRINT_HOOKS = tuple(
+    "Blueprint." + hook
+    for hook in (
+        "after_app_request",
+        "after_request",
+        "before_app_request",
+        "before_request",
+        "teardown_request",
+        "teardown_app_request",
+    )
+    + (("before_app_first_request",) if flask_version < (2, 3, 0) else ())
+)
+
 
 class _FlaskWSGIMiddleware(_DDWSGIMiddlewareBase):
+    __slots__ = ()
+
     _request_span_name = schematize_url_operation("flask.request", protocol="http", direction=SpanDirection.INBOUND)
     _application_span_name = "flask.application"
     _response_span_name = "flask.response"
@@ -125,9 +171,12 @@ class _FlaskWSGIMiddleware(_DDWSGIMiddlewareBase):
 
         if not core.get_item(HTTP_REQUEST_BLOCKED):
             headers_from_context = ""
-            results, exceptions = core.dispatch("flask.start_response", [])
-            if not any(exceptions) and results and results[0]:
-                headers_from_context = results[0]
+            # DEV: only AppSec listens to these events, skip the dispatch when it is not enabled
+            if core.has_listeners("flask.start_response"):
+                results, exceptions = core.dispatch("flask.start_response", [])
+                # DEV: AppSec registers the only listener, only its result matters
+                if results and exceptions[0] is None and results[0]:
+                    headers_from_context = results[0]
             if core.get_item(HTTP_REQUEST_BLOCKED):
                 # response code must be set here, or it will be too late
                 ctype = "text/html" if "text/html" in headers_from_context else "text/json"
@@ -161,26 +210,43 @@ class _FlaskWSGIMiddleware(_DDWSGIMiddlewareBase):
         span.set_tag_str(FLASK_VERSION, flask_version_str)
 
         req_body = None
-        results, exceptions = core.dispatch(
-            "flask.request_span_modifier", [request, environ, _HAS_JSON_MIXIN, BadRequest]
-        )
-        if not any(exceptions) and results and results[0]:
-            req_body = results[0]
+        if core.has_listeners("flask.request_span_modifier"):
+            results, exceptions = core.dispatch(
+                "flask.request_span_modifier", [request, environ, _HAS_JSON_MIXIN, BadRequest]
+            )
+            if results and exceptions[0] is None and results[0]:
+                req_body = results[0]
+        # DEV: the raw uri, parsed query and cookies are only sent to the WAF,
+        #      don't build them (werkzeug parses them lazily) when AppSec is disabled
+        raw_uri = parsed_query = request_cookies = None
+        if config._appsec_enabled:
+            raw_uri, parsed_query, request_cookies = request.url, request.args, request.cookies
         trace_utils.set_http_meta(
             span,
             config.flask,
             method=request.method,
             url=request.base_url,
-            raw_uri=request.url,
+            raw_uri=raw_uri,
             query=request.query_string,
-            parsed_query=request.args,
+            parsed_query=parsed_query,
             request_headers=request.headers,
-            request_cookies=request.cookies,
+            request_cookies=request_cookies,
             request_body=req_body,
             peer_ip=request.remote_addr,
         )
 
 
+# (parent object, attribute name) of everything wrapped by patch(), in wrapping order
+_PATCHED_TARGETS = []  # type: List[Tuple[Any, str]]
+
+
+def _wrap(module, name, wrapper):
+    """Wrap ``name`` of ``module`` and record its target for unpatch()"""
+    parent, attribute, _ = resolve_path(module, name)
+    _w(module, name, wrapper)
+    _PATCHED_TARGETS.append((parent, attribute))
+
+
 def patch():
     """
     Patch `flask` module for tracing
@@ -193,77 +259,45 @@ def patch():
     Pin().onto(flask.Flask)
     core.dispatch("flask.patch", [flask_version])
     # flask.app.Flask methods that have custom tracing (add metadata, wrap functions, etc)
-    _w("flask", "Flask.wsgi_app", traced_wsgi_app)
-    _w("flask", "Flask.dispatch_request", request_tracer("dispatch_request"))
-    _w("flask", "Flask.preprocess_request", request_tracer("preprocess_request"))
-    _w("flask", "Flask.add_url_rule", traced_add_url_rule)
-    _w("flask", "Flask.endpoint", traced_endpoint)
+    _wrap(flask, "Flask.wsgi_app", traced_wsgi_app)
+    _wrap(flask, "Flask.dispatch_request", request_tracer("dispatch_request"))
+    _wrap(flask, "Flask.preprocess_request", request_tracer("preprocess_request"))
+    _wrap(flask, "Flask.add_url_rule", traced_add_url_rule)
+    _wrap(flask, "Flask.endpoint", traced_endpoint)
 
-    _w("flask", "Flask.finalize_request", traced_finalize_request)
+    _wrap(flask, "Flask.finalize_request", traced_finalize_request)
 
     if flask_version >= (2, 0, 0):
-        _w("flask", "Flask.register_error_handler", traced_register_error_handler)
+        _wrap(flask, "Flask.register_error_handler", traced_register_error_handler)
     else:
-        _w("flask", "Flask._register_error_handler", traced__register_error_handler)
+        _wrap(flask, "Flask._register_error_handler", traced__register_error_handler)
 
     # flask.blueprints.Blueprint methods that have custom tracing (add metadata, wrap functions, etc)
-    _w("flask", "Blueprint.register", traced_blueprint_register)
-    _w("flask", "Blueprint.add_url_rule", traced_blueprint_add_url_rule)
+    _wrap(flask, "Blueprint.register", traced_blueprint_register)
+    _wrap(flask, "Blueprint.add_url_rule", traced_blueprint_add_url_rule)
 
     # flask.app.Flask traced hook decorators
-    flask_hooks = [
-        "before_request",
-        "after_request",
-        "teardown_request",
-        "teardown_appcontext",
-    ]
-    if flask_version < (2, 3, 0):
-        flask_hooks.append("before_first_request")
-
-    for hook in flask_hooks:
-        _w("flask", "Flask.{}".format(hook), traced_flask_hook)
-    _w("flask", "after_this_request", traced_flask_hook)
+    for hook in _FLASK_HOOKS:
+        _wrap(flask, hook, traced_flask_hook)
+    _wrap(flask, "after_this_request", traced_flask_hook)
 
     # flask.app.Flask traced methods
-    flask_app_traces = [
-        "process_response",
-        "handle_exception",
-        "handle_http_exception",
-        "handle_user_exception",
-        "do_teardown_request",
-        "do_teardown_appcontext",
-        "send_static_file",
-    ]
-    if flask_version < (2, 2, 0):
-        flask_app_traces.append("try_trigger_before_first_request_functions")
-
-    for name in flask_app_traces:
-        _w("flask", "Flask.{}".format(name), simple_tracer("flask.{}".format(name)))
+    for name, span_name in _FLASK_APP_TRACES:
+        _wrap(flask, name, simple_tracer(span_name))
     # flask static file helpers
-    _w("flask", "send_file", simple_tracer("flask.send_file"))
+    _wrap(flask, "send_file", simple_tracer("flask.send_file"))
 
     # flask.json.jsonify
-    _w("flask", "jsonify", traced_jsonify)
+    _wrap(flask, "jsonify", traced_jsonify)
 
     # flask.templating traced functions
-    _w("flask.templating", "_render", traced_render)
-    _w("flask", "render_template", traced_render_template)
-    _w("flask", "render_template_string", traced_render_template_string)
+    _wrap("flask.templating", "_render", traced_render)
+    _wrap(flask, "render_template", traced_render_template)
+    _wrap(flask, "render_template_string", traced_render_template_string)
 
     # flask.blueprints.Blueprint traced hook decorators
-    bp_hooks = [
-        "after_app_request",
-        "after_request",
-        "before_app_request",
-        "before_request",
-        "teardown_request",
-        "teardown_app_request",
-    ]
-    if flask_version < (2, 3, 0):
-        bp_hooks.append("before_app_first_request")
-
-    for hook in bp_hooks:
-        _w("flask", "Blueprint.{}".format(hook), traced_flask_hook)
+    for hook in _BLUEPRINT_HOOKS:
+        _wrap(flask, hook, traced_flask_hook)
 
     # flask.signals signals
     if config.flask["trace_signals"]:
@@ -296,7 +330,7 @@ def patch():
                 module = "flask.signals"
 
             # DEV: Patch `receivers_for` instead of `connect` to ensure we don't mess with `disconnect`
-            _w(module, "{}.receivers_for".format(signal), traced_signal_receivers_for(signal))
+            _wrap(module, "{}.receivers_for".format(signal), traced_signal_receivers_for(signal))
 
 
 def unpatch():
@@ -304,92 +338,9 @@ def unpatch():
         return
     setattr(flask, "_datadog_patch", False)
 
-    props = [
-        # Flask
-        "Flask.wsgi_app",
-        "Flask.dispatch_request",
-        "Flask.add_url_rule",
-        "Flask.endpoint",
-        "Flask.preprocess_request",
-        "Flask.process_response",
-        "Flask.handle_exception",
-        "Flask.handle_http_exception",
-        "Flask.handle_user_exception",
-        "Flask.do_teardown_request",
-        "Flask.do_teardown_appcontext",
-        "Flask.send_static_file",
-        # Flask Hooks
-        "Flask.before_request",
-        "Flask.after_request",
-        "Flask.teardown_request",
-        "Flask.teardown_appcontext",
-        # Blueprint
-        "Blueprint.register",
-        "Blueprint.add_url_rule",
-        # Blueprint Hooks
-        "Blueprint.after_app_request",
-        "Blueprint.after_request",
-        "Blueprint.before_app_request",
-        "Blueprint.before_request",
-        "Blueprint.teardown_request",
-        "Blueprint.teardown_app_request",
-        # Signals
-        "template_rendered.receivers_for",
-        "request_started.receivers_for",
-        "request_finished.receivers_for",
-        "request_tearing_down.receivers_for",
-        "got_request_exception.receivers_for",
-        "appcontext_tearing_down.receivers_for",
-        # Top level props
-        "after_this_request",
-        "send_file",
-        "jsonify",
-        "render_template",
-        "render_template_string",
-        "templating._render",
-    ]
-
-    props.append("Flask.finalize_request")
-
-    if flask_version >= (2, 0, 0):
-        props.append("Flask.register_error_handler")
-    else:
-        props.append("Flask._register_error_handler")
-
-    # These were added in 0.11.0
-    if flask_version >= (0, 11):
-        props.append("before_render_template.receivers_for")
-
-    # These were added in 0.10.0
-    if flask_version >= (0, 10):
-        props.append("appcontext_pushed.receivers_for")
-        props.append("appcontext_popped.receivers_for")
-        props.append("message_flashed.receivers_for")
-
-    # These were removed in 2.2.0
-    if flask_version < (2, 2, 0):
-        props.append("Flask.try_trigger_before_first_request_functions")
-
-    # These were removed in 2.3.0
-    if flask_version < (2, 3, 0):
-        props.append("Flask.before_first_request")
-        props.append("Blueprint.before_app_first_request")
-
-    for prop in props:
-        # Handle 'flask.request_started.receivers_for'
-        obj = flask
-
-        # v0.9.0 missed importing `appcontext_tearing_down` in `flask/__init__.py`
-        #  https://github.com/pallets/flask/blob/0.9/flask/__init__.py#L35-L37
-        #  https://github.com/pallets/flask/blob/0.9/flask/signals.py#L52
-        # DEV: Version 0.9 doesn't have a patch version
-        if flask_version <= (0, 9) and prop == "appcontext_tearing_down.receivers_for":
-            obj = flask.signals
-
-        if "." in prop:
-            attr, _, prop = prop.partition(".")
-            obj = getattr(obj, attr, object())
-        _u(obj, prop)
+    for obj, attr in reversed(_PATCHED_TARGETS):
+        _u(obj, attr)
+    del _PATCHED_TARGETS[:]
 
 
 @with_instance_pin
@@ -402,7 +353,16 @@ def traced_wsgi_app(pin, wrapped, instance, args, kwargs):
     # DEV: This is safe before this is the args for a WSGI handler
     #   https://www.python.org/dev/peps/pep-3333/
     environ, start_response = args
-    middleware = _FlaskWSGIMiddleware(wrapped, pin.tracer, config.flask, pin)
+    # DEV: Reuse the middleware built for this app until the pin, its tracer or the integration config change
+    middleware = getattr(instance, "_dd_wsgi_middleware", None)
+    if (
+        middleware is None
+        or middleware._pin is not pin
+        or middleware.tracer is not pin.tracer
+        or middleware._config is not config.flask
+    ):
+        middleware = _FlaskWSGIMiddleware(wrapped, pin.tracer, config.flask, pin)
+        instance._dd_wsgi_middleware = middleware
     return middleware(environ, start_response)
 
 
@@ -514,14 +474,12 @@ def traced_render(wrapped, instance, args, kwargs):
     if not pin.enabled or not span:
         return wrapped(*args, **kwargs)
 
-    def _wrap(template, context, app):
-        name = maybe_stringify(getattr(template, "name", None) or config.flask.get("template_default_name"))
-        if name is not None:
-            span.resource = name
-            span.set_tag_str("flask.template_name", name)
-        return wrapped(*args, **kwargs)
-
-    return _wrap(*args, **kwargs)
+    template = get_argument_value(args, kwargs, 0, "template")
+    name = maybe_stringify(getattr(template, "name", None) or config.flask.get("template_default_name"))
+    if name is not None:
+        span.resource = name
+        span.set_tag_str("flask.template_name", name)
+    return wrapped(*args, **kwargs)
 
 
 def traced__register_error_handler(wrapped, instance, args, kwargs):
@@ -606,11 +564,11 @@ def traced_signal_receivers_for(signal):
     def outer(wrapped, instance, args, kwargs):
         sender = get_argument_value(args, kwargs, 0, "sender")
         # See if they gave us the flask.app.Flask as the sender
+        # DEV: Check the exact type first, apps are rarely subclasses of flask.Flask
         app = None
-        if isinstance(sender, flask.Flask):
+        if type(sender) is flask.Flask or isinstance(sender, flask.Flask):
             app = sender
-        for receiver in wrapped(*args, **kwargs):
-            yield wrap_signal(app, signal, receiver)
+        return [wrap_signal(app, signal, receiver) for receiver in wrapped(*args, **kwargs)]
 
     return outer
 
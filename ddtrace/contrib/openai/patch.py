@@ -37,6 +37,15 @@ config._add(
 )
 
 
+# (openai module attribute, span tag) pairs set on every request span
+_BASE_SPAN_TAGS = (
+    ("api_base", "openai.api_base"),
+    ("api_version", "openai.api_version"),
+    ("api_type", "openai.api_type"),
+    ("organization", "openai.organization.id"),
+)
+
+
 class _OpenAIIntegration(BaseLLMIntegration):
     _integration_name = "openai"
 
@@ -60,19 +69,17 @@ class _OpenAIIntegration(BaseLLMIntegration):
     def _set_base_span_tags(self, span):
         # type: (Span) -> None
         span.set_tag_str(COMPONENT, self._config.integration_name)
-        if self._user_api_key is not None:
-            span.set_tag_str("openai.user.api_key", self._user_api_key)
+        user_api_key = self._user_api_key
+        if user_api_key is not None:
+            span.set_tag_str("openai.user.api_key", user_api_key)
 
         # Do these dynamically as openai users can set these at any point
         # not necessarily before patch() time.
         # organization_id is only returned by a few endpoints, grab it when we can.
-        for attr in ("api_base", "api_version", "api_type", "organization"):
+        for attr, tag in _BASE_SPAN_TAGS:
             v = getattr(self._openai, attr, None)
             if v is not None:
-                if attr == "organization":
-                    span.set_tag_str("openai.organization.id", v or "")
-                else:
-                    span.set_tag_str("openai.%s" % attr, v)
+                span.set_tag_str(tag, v or "")
 
     @classmethod
     def _logs_tags(cls, span):
@@ -378,20 +385,20 @@ def _patched_endpoint(openai, integration, patch_hook):
 
         g = _traced_endpoint(patch_hook, integration, pin, args, kwargs)
         g.send(None)
-        resp, err = None, None
         try:
             resp = func(*args, **kwargs)
-            return resp
-        except Exception as e:
-            err = e
-            raise
-        finally:
+        except BaseException as err:
             try:
-                g.send((resp, err))
-            except StopIteration as e:
-                if err is None:
-                    # This return takes priority over `return resp`
-                    return e.value
+                g.send((None, err))
+            except StopIteration:
+                pass
+            raise
+        try:
+            g.send((resp, None))
+        except StopIteration as e:
+            # The value returned by the hook takes priority over `resp`
+            return e.value
+        return resp
 
     return patched_endpoint
 
@@ -404,20 +411,20 @@ def _patched_endpoint_async(openai, integration, patch_hook):
             return await func(*args, **kwargs)
         g = _traced_endpoint(patch_hook, integration, pin, args, kwargs)
         g.send(None)
-        resp, err = None, None
         try:
             resp = await func(*args, **kwargs)
-            return resp
-        except Exception as e:
-            err = e
-            raise
-        finally:
+        except BaseException as err:
             try:
-                g.send((resp, err))
-            except StopIteration as e:
-                if err is None:
-                    # This return takes priority over `return resp`
-                    return e.value
+                g.send((None, err))
+            except StopIteration:
+                pass
+            raise
+        try:
+            g.send((resp, None))
+        except StopIteration as e:
+            # The value returned by the hook takes priority over `resp`
+            return e.value
+        return resp
 
     return patched_endpoint
 
@@ -429,14 +436,15 @@ def _patched_convert(openai, integration):
         if not pin or not pin.enabled():
             return func(*args, **kwargs)
 
-        span = pin.tracer.current_span()
-        if not span:
-            return func(*args, **kwargs)
-
+        # DEV: check the cheap type condition first, the active span lookup goes through the context provider
         val = args[0]
         if not isinstance(val, openai.openai_response.OpenAIResponse):
             return func(*args, **kwargs)
 
+        span = pin.tracer.current_span()
+        if not span:
+            return func(*args, **kwargs)
+
         # This function is called for each chunk in the stream.
         # To prevent needlessly setting the same tags for each chunk, short-circuit here.
         if span.get_tag("openai.organization.name") is not None:
@@ -37,7 +37,7 @@ except ImportError:
     JSONDecodeError = ValueError  # type: ignore
 
 log = get_logger(__name__)
-_BODY_METHODS = {"POST", "PUT", "DELETE", "PATCH"}
+_BODY_METHODS = frozenset(("POST", "PUT", "DELETE", "PATCH"))
 
 
 class PylonsTraceMiddleware(object):
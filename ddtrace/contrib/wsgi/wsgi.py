@@ -55,6 +55,8 @@ class _DDWSGIMiddlewareBase(object):
     :param pin: Set tracing metadata on a particular traced connection
     """
 
+    __slots__ = ("app", "tracer", "_config", "_pin")
+
     def __init__(self, application, tracer, int_config, pin):
         # type: (Iterable, Tracer, Config, Pin) -> None
         self.app = application
@@ -157,11 +157,12 @@ class ExecutionContext:
     def get_item(self, data_key):
         # type: (str) -> Optional[Any]
         # NB mimic the behavior of `ddtrace.internal._context` by doing lazy inheritance
+        log.debug("Checking context '%s' and its parents for data at key '%s'", self.identifier, data_key)
         current = self
         while current is not None:
-            log.debug("Checking context '%s' for data at key '%s'", current.identifier, data_key)
-            if data_key in current._data:
-                return current._data.get(data_key)
+            data = current._data
+            if data_key in data:
+                return data[data_key]
             current = current.parent
         return None
 
@@ -218,7 +219,7 @@ def get_item(data_key, span=None):
 def get_items(data_keys, span=None):
     # type: (List[str], Optional[Span]) -> Optional[Any]
     if span is not None and span._local_root is not None:
-        return [span._local_root._get_ctx_item(key) for key in data_keys]
+        return span._local_root._get_ctx_items(data_keys)
     else:
         return _CURRENT_CONTEXT.get().get_items(data_keys)  # type: ignore
 
@@ -1,5 +1,7 @@
 import atexit
+from collections import deque
 import json
+from typing import Deque
 from typing import List
 
 
@@ -9,7 +11,6 @@ try:
 except ImportError:
     from typing_extensions import TypedDict
 
-from ddtrace.internal import forksafe
 from ddtrace.internal.compat import get_connection_response
 from ddtrace.internal.compat import httplib
 from ddtrace.internal.logger import get_logger
@@ -50,8 +51,9 @@ class V2LogWriter(PeriodicService):
     def __init__(self, site, api_key, interval, timeout):
         # type: (str, str, float, float) -> None
         super(V2LogWriter, self).__init__(interval=interval)
-        self._lock = forksafe.RLock()
-        self._buffer = []  # type: List[V2LogEvent]
+        # DEV: deque.append and deque.popleft are atomic, so logs are enqueued from the
+        # instrumented code without taking a lock
+        self._buffer = deque()  # type: Deque[V2LogEvent]
         # match the API limit
         self._buffer_limit = 1000
         self._timeout = timeout  # type: float
@@ -71,11 +73,12 @@ class V2LogWriter(PeriodicService):
 
     def enqueue(self, log):
         # type: (V2LogEvent) -> None
-        with self._lock:
-            if len(self._buffer) >= self._buffer_limit:
-                logger.warning("log buffer full (limit is %d), dropping log", self._buffer_limit)
-                return
-            self._buffer.append(log)
+        # DEV: the check and the append are not atomic, concurrent enqueues can go over the
+        # limit by at most one log per thread; periodic() still sends at most the limit per request
+        if len(self._buffer) >= self._buffer_limit:
+            logger.warning("log buffer full (limit is %d), dropping log", self._buffer_limit)
+            return
+        self._buffer.append(log)
 
     def on_shutdown(self):
         self.periodic()
@@ -87,11 +90,18 @@ class V2LogWriter(PeriodicService):
 
     def periodic(self):
         # type: () -> None
-        with self._lock:
-            if not self._buffer:
-                return
-            logs = self._buffer
-            self._buffer = []
+        buffer = self._buffer
+        logs = []  # type: List[V2LogEvent]
+        # DEV: on_shutdown can drain the buffer at the same time as the periodic thread, so pop
+        # until the buffer is empty instead of popping a precomputed number of logs. Logs
+        # enqueued while draining are sent on the next run, and never more than the API accepts.
+        while len(logs) < self._buffer_limit:
+            try:
+                logs.append(buffer.popleft())
+            except IndexError:
+                break
+        if not logs:
+            return
 
         num_logs = len(logs)
         try:
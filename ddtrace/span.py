@@ -199,6 +199,13 @@ class Span(object):
             return None
         return self._store.get(key)
 
+    def _get_ctx_items(self, keys):
+        # type: (List[str]) -> List[Optional[Any]]
+        store = self._store
+        if not store:
+            return [None] * len(keys)
+        return [store.get(key) for key in keys]
+
     @property
     def _trace_id_64bits(self):
         return _get_64_lowest_order_bits_as_int(self.trace_id)
@@ -1,4 +1,6 @@
+import base64
 import hashlib
+import multiprocessing
 import os
 import platform
 import re
@@ -27,11 +29,30 @@ except ImportError:
         "https://ddtrace.readthedocs.io/en/stable/installation_quickstart.html"
     )
 
+try:
+    # Optional, faster gzip decompression of the downloaded archives
+    from isal.igzip import open as gzip_open
+except ImportError:
+    from gzip import open as gzip_open
+
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    # Python 2.7 without the ``futures`` backport: download the archives one after the other
+    ThreadPoolExecutor = None
+
 if sys.version_info >= (3, 0):
+    import http.client
+    import threading
+    from urllib.error import ContentTooShortError
     from urllib.error import HTTPError
-    from urllib.request import urlretrieve
+    from urllib.parse import unquote
+    from urllib.parse import urljoin
+    from urllib.parse import urlsplit
+    from urllib.request import getproxies
+    from urllib.request import proxy_bypass
 else:
-    from urllib import urlretrieve
+    from urllib import urlretrieve as download_file
 
     from urllib2 import HTTPError
 
@@ -55,11 +76,123 @@ LIBDATADOG_PROF_DOWNLOAD_DIR = os.path.join(
 
 LIBDATADOG_PROF_VERSION = "v2.1.0"
 
+# Use the native libraries already in the source tree instead of downloading them
+SKIP_DOWNLOAD = os.getenv("DD_SETUP_SKIP_DOWNLOAD", "").lower() in ("1", "true")
+
+# Downloaded archives are kept there between builds, set DD_SETUP_CACHE to an empty value to disable it
+DOWNLOAD_CACHE_DIR = os.getenv("DD_SETUP_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "ddtrace-build"))
+
+
+# Reject unsafe archive members (absolute paths, links outside the destination, ...) where tarfile supports it
+TAR_EXTRACT_KWARGS = {"filter": "data"} if hasattr(tarfile, "data_filter") else {}
+
+# Copy downloads and extracted files in 128KiB chunks rather than the 8KiB and 16KiB defaults of shutil and tarfile
+DOWNLOAD_CHUNK_SIZE = 128 * 1024
+
+if sys.version_info >= (3, 0):
+    # Keep-alive connections to the download hosts, one per host and per downloading thread
+    _HTTP_CONNECTIONS = threading.local()
+
+    def _http_connection(scheme, netloc):
+        """Open a connection to ``netloc``, through the proxy set in the environment like ``urllib`` does
+
+        Returns the connection, whether requests must use the absolute URL as target, and the headers to send.
+        """
+        conn_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        proxy = getproxies().get(scheme)
+        if not proxy or proxy_bypass(netloc):
+            return conn_class(netloc, timeout=60), False, {}
+
+        proxy_parts = urlsplit(proxy if "://" in proxy else "http://" + proxy)
+        proxy_headers = {}
+        if proxy_parts.username is not None:
+            credentials = "%s:%s" % (unquote(proxy_parts.username), unquote(proxy_parts.password or ""))
+            proxy_headers["Proxy-Authorization"] = "Basic " + base64.b64encode(credentials.encode()).decode("ascii")
+        proxy_port = proxy_parts.port or (443 if proxy_parts.scheme == "https" else 80)
+        if scheme == "https":
+            # TLS with the download host through a CONNECT tunnel opened by the proxy
+            conn = conn_class(proxy_parts.hostname, proxy_port, timeout=60)
+            conn.set_tunnel(netloc, headers=proxy_headers)
+            return conn, False, {}
+        return http.client.HTTPConnection(proxy_parts.hostname, proxy_port, timeout=60), True, proxy_headers
+
+    def download_file(url, filename, max_redirects=5):  # noqa: F811
+        """Download ``url`` to ``filename``, reusing the connection opened for a previous download from the same host
+
+        Mimics ``urllib.request.urlretrieve``: returns ``(filename, headers)``, raises ``HTTPError`` or
+        ``ContentTooShortError`` and honors the ``http_proxy``, ``https_proxy`` and ``no_proxy`` environment variables.
+        """
+        connections = _HTTP_CONNECTIONS.__dict__
+        for _ in range(max_redirects + 1):
+            parts = urlsplit(url)
+            key = (parts.scheme, parts.netloc)
+            path = (parts.path or "/") + ("?" + parts.query if parts.query else "")
+            # Retry once on a fresh connection in case the server closed the one we kept around
+            for attempt in range(2):
+                if key not in connections:
+                    connections[key] = _http_connection(parts.scheme, parts.netloc)
+                conn, absolute_target, headers = connections[key]
+                target = "%s://%s%s" % (parts.scheme, parts.netloc, path) if absolute_target else path
+                try:
+                    conn.request("GET", target, None, headers)
+                    response = conn.getresponse()
+                    break
+                except BaseException as e:
+                    conn.close()
+                    del connections[key]
+                    if attempt or not isinstance(e, (http.client.HTTPException, OSError)):
+                        raise
+
+            redirect = response.status in (301, 302, 303, 307, 308)
+            try:
+                if redirect or response.status >= 400:
+                    # Drain the body so that the connection can be reused
+                    response.read()
+                else:
+                    with open(filename, "wb") as f:
+                        shutil.copyfileobj(response, f, DOWNLOAD_CHUNK_SIZE)
+                        size = f.tell()
+                    expected_size = response.getheader("Content-Length")
+                    if expected_size is not None and size < int(expected_size):
+                        raise ContentTooShortError(
+                            "retrieval incomplete: got only %d out of %s bytes" % (size, expected_size),
+                            (filename, response.headers),
+                        )
+            except BaseException:
+                # Never reuse a connection left with a partially read response
+                conn.close()
+                connections.pop(key, None)
+                raise
+
+            if redirect:
+                url = urljoin(url, response.getheader("Location"))
+                continue
+            if response.status >= 400:
+                raise HTTPError(url, response.status, response.reason, response.headers, None)
+            return filename, response.headers
+
+        raise HTTPError(url, response.status, "Too many redirects", response.headers, None)
+
+
+def sha256_of_file(filename, chunk_size=1 << 20):
+    """Compute the hex SHA-256 digest of ``filename`` without loading the whole file in memory"""
+    if hasattr(hashlib, "file_digest"):
+        # Python 3.11+
+        with open(filename, "rb") as f:
+            return hashlib.file_digest(f, "sha256").hexdigest()
+
+    checksum = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            checksum.update(chunk)
+    return checksum.hexdigest()
+
 
 def verify_checksum_from_file(sha256_filename, filename):
     # sha256 File format is ``checksum`` followed by two whitespaces, then ``filename`` then ``\n``
-    expected_checksum, expected_filename = list(filter(None, open(sha256_filename, "r").read().strip().split(" ")))
-    actual_checksum = hashlib.sha256(open(filename, "rb").read()).hexdigest()
+    with open(sha256_filename, "r") as f:
+        expected_checksum, expected_filename = list(filter(None, f.read().strip().split(" ")))
+    actual_checksum = sha256_of_file(filename)
     try:
         assert expected_filename.endswith(filename)
         assert expected_checksum == actual_checksum
@@ -74,7 +207,7 @@ def verify_checksum_from_file(sha256_filename, filename):
 
 def verify_checksum_from_hash(expected_checksum, filename):
     # sha256 File format is ``checksum`` followed by two whitespaces, then ``filename`` then ``\n``
-    actual_checksum = hashlib.sha256(open(filename, "rb").read()).hexdigest()
+    actual_checksum = sha256_of_file(filename)
     try:
         assert expected_checksum == actual_checksum
     except AssertionError:
@@ -101,10 +234,6 @@ def load_module_from_project_file(mod_name, fname):
         mod = importlib.util.module_from_spec(spec)
         spec.loader.exec_module(mod)
         return mod
-    elif sys.version_info >= (3, 3):
-        from importlib.machinery import SourceFileLoader
-
-        return SourceFileLoader(mod_name, fpath).load_module()
     else:
         import imp
 
@@ -128,14 +257,10 @@ class LibraryDownload:
     def download_artifacts(cls):
         suffixes = cls.translate_suffix[CURRENT_OS]
 
-        # If the directory exists and it is not empty, assume the right files are there.
-        # Use `python setup.py clean` to remove it.
-        if os.path.isdir(cls.download_dir) and os.listdir(cls.download_dir):
-            return
-
         if not os.path.isdir(cls.download_dir):
             os.makedirs(cls.download_dir)
 
+        archs = []
         for arch in cls.available_releases[CURRENT_OS]:
             if CURRENT_OS == "Linux" and not get_build_platform().endswith(arch):
                 # We cannot include the dynamic libraries for other architectures here.
@@ -143,7 +268,7 @@ class LibraryDownload:
             elif CURRENT_OS == "Darwin":
                 # Detect build type for macos:
                 # https://github.com/pypa/cibuildwheel/blob/main/cibuildwheel/macos.py#L250
-                target_platform = os.getenv("PLAT")
+                target_platform = os.getenv("PLAT") or platform.machine()
                 # Darwin Universal2 should bundle both architectures
                 if not target_platform.endswith(("universal2", arch)):
                     continue
@@ -151,45 +276,43 @@ class LibraryDownload:
                 # Win32 can be built on a 64-bit machine so build_platform may not be relevant
                 continue
 
-            arch_dir = os.path.join(cls.download_dir, arch)
-
-            # If the directory for the architecture exists, assume the right files are there
-            if os.path.isdir(arch_dir):
+            # If the library directory for the architecture exists and it is not empty, assume the right files are
+            # there: it is only moved in place once the archive is fully extracted.
+            # Use `python setup.py clean` to remove it.
+            lib_dir = os.path.join(cls.download_dir, arch, "lib")
+            if os.path.isdir(lib_dir) and os.listdir(lib_dir):
                 continue
 
-            archive_dir = cls.get_package_name(arch, CURRENT_OS)
-            archive_name = archive_dir + ".tar.gz"
+            archs.append(arch)
 
-            download_address = "%s/%s/%s" % (
-                cls.url_root,
-                cls.version,
-                archive_name,
-            )
+        # The downloads are network bound and independent from each other: fetch them concurrently,
+        # then verify and extract the archives one at a time.
+        if ThreadPoolExecutor is not None and len(archs) > 1:
+            with ThreadPoolExecutor(max_workers=len(archs)) as executor:
+                downloads = list(executor.map(cls.fetch_archive, archs))
+        else:
+            downloads = [cls.fetch_archive(arch) for arch in archs]
 
-            try:
-                filename, http_response = urlretrieve(download_address, archive_name)
-            except HTTPError as e:
-                print("No archive found for dynamic library {}: {}".format(cls.name, archive_dir))
-                raise e
+        for arch, archive_dir, filename, sha256_filename in downloads:
+            arch_dir = os.path.join(cls.download_dir, arch)
 
             # Verify checksum of downloaded file
-            if cls.expected_checksums is None:
-                sha256_address = download_address + ".sha256"
-                sha256_filename, http_response = urlretrieve(sha256_address, archive_name + ".sha256")
+            if sha256_filename is not None:
                 verify_checksum_from_file(sha256_filename, filename)
             else:
                 expected_checksum = cls.expected_checksums[CURRENT_OS][arch]
                 verify_checksum_from_hash(expected_checksum, filename)
 
-            # Open the tarfile first to get the files needed.
-            # This could be solved with "r:gz" mode, that allows random access
-            # but that approach does not work on Windows
-            with tarfile.open(filename, "r|gz", errorlevel=2) as tar:
-                dynfiles = [c for c in tar.getmembers() if c.name.endswith(suffixes)]
-
-            with tarfile.open(filename, "r|gz", errorlevel=2) as tar:
-                tar.extractall(members=dynfiles, path=HERE)
-                os.rename(os.path.join(HERE, archive_dir), arch_dir)
+            # Extract the files needed while streaming through the archive ("r|" mode), in a single pass.
+            # "r:gz" mode would allow random access but that approach does not work on Windows
+            with gzip_open(filename, "rb") as archive, tarfile.open(fileobj=archive, mode="r|", errorlevel=2) as tar:
+                tar.copybufsize = DOWNLOAD_CHUNK_SIZE
+                for member in tar:
+                    if member.name.endswith(suffixes):
+                        tar.extract(member, path=HERE, **TAR_EXTRACT_KWARGS)
+            # Replace what is left of a previous, incomplete download
+            shutil.rmtree(arch_dir, True)
+            os.rename(os.path.join(HERE, archive_dir), arch_dir)
 
             # Rename <name>.xxx to lib<name>.xxx so the filename is the same for every OS
             for suffix in suffixes:
@@ -200,8 +323,70 @@ class LibraryDownload:
 
             os.remove(filename)
 
+    @classmethod
+    def fetch_archive(cls, arch):
+        """Download the release archive for ``arch``, and its ``.sha256`` file when no checksum is pinned"""
+        archive_dir = cls.get_package_name(arch, CURRENT_OS)
+        archive_name = archive_dir + ".tar.gz"
+
+        download_address = "%s/%s/%s" % (
+            cls.url_root,
+            cls.version,
+            archive_name,
+        )
+
+        sha256_filename = archive_name + ".sha256" if cls.expected_checksums is None else None
+        cache_dir = os.path.join(DOWNLOAD_CACHE_DIR, cls.name, cls.version) if DOWNLOAD_CACHE_DIR else None
+
+        if cache_dir is not None and cls.is_cached(arch, cache_dir, archive_name):
+            for name in filter(None, (archive_name, sha256_filename)):
+                shutil.copyfile(os.path.join(cache_dir, name), name)
+            return arch, archive_dir, archive_name, sha256_filename
+
+        try:
+            filename, http_response = download_file(download_address, archive_name)
+        except HTTPError as e:
+            print("No archive found for dynamic library {}: {}".format(cls.name, archive_dir))
+            raise e
+
+        if sha256_filename is not None:
+            sha256_address = download_address + ".sha256"
+            sha256_filename, http_response = download_file(sha256_address, sha256_filename)
+
+        if cache_dir is not None:
+            # The files are checked again against their checksum before being used from the cache
+            try:
+                if not os.path.isdir(cache_dir):
+                    os.makedirs(cache_dir)
+                for name in filter(None, (sha256_filename, filename)):
+                    shutil.copyfile(name, os.path.join(cache_dir, name + ".tmp"))
+                    os.rename(os.path.join(cache_dir, name + ".tmp"), os.path.join(cache_dir, name))
+            except (IOError, OSError) as e:
+                print("WARNING: Failed to cache the {} archive {}: {}".format(cls.name, archive_name, e))
+        return arch, archive_dir, filename, sha256_filename
+
+    @classmethod
+    def is_cached(cls, arch, cache_dir, archive_name):
+        """Whether a copy of ``archive_name`` matching its expected checksum was kept from a previous build"""
+        cached_archive = os.path.join(cache_dir, archive_name)
+        if not os.path.isfile(cached_archive):
+            return False
+
+        if cls.expected_checksums is not None:
+            expected_checksum = cls.expected_checksums[CURRENT_OS][arch]
+        else:
+            try:
+                with open(cached_archive + ".sha256", "r") as f:
+                    expected_checksum = f.read().split()[0]
+            except (IOError, OSError, IndexError):
+                return False
+        return sha256_of_file(cached_archive) == expected_checksum
+
     @classmethod
     def run(cls):
+        if SKIP_DOWNLOAD:
+            print("Skipping the download of the {} library, DD_SETUP_SKIP_DOWNLOAD is set".format(cls.name))
+            return
         cls.download_artifacts()
 
 
@@ -277,7 +462,8 @@ class LibDatadogDownload(LibraryDownload):
 
 class LibraryDownloader(BuildPyCommand):
     def run(self):
-        CleanLibraries.remove_artifacts()
+        if not SKIP_DOWNLOAD:
+            CleanLibraries.remove_artifacts()
         LibDatadogDownload.run()
         LibDDWafDownload.run()
         BuildPyCommand.run(self)
@@ -296,6 +482,13 @@ class CleanLibraries(CleanCommand):
 
 
 class CMakeBuild(build_ext):
+    def finalize_options(self):
+        build_ext.finalize_options(self)
+        # Build the extensions in parallel when no level was given with ``build_ext -j``, which pip and PyPA-build
+        # do not support. Set DD_COMPILE_PARALLEL=1 to build them one by one.
+        if not getattr(self, "parallel", None):
+            self.parallel = int(os.getenv("DD_COMPILE_PARALLEL", 0)) or multiprocessing.cpu_count()
+
     @staticmethod
     def strip_symbols(so_file):
         subprocess.check_output(["strip", "-g", so_file])
@@ -375,11 +568,12 @@ class CMakeBuild(build_ext):
         else:
             build_ext.build_extension(self, ext)
             if CURRENT_OS == "Linux":
-                for ext in self.extensions:
-                    try:
-                        self.strip_symbols(self.get_ext_fullpath(ext.name))
-                    except Exception:
-                        pass
+                # Only strip the extension that was just built: with ``build_ext -j`` the extensions are built,
+                # and so stripped, in parallel.
+                try:
+                    self.strip_symbols(self.get_ext_fullpath(ext.name))
+                except Exception:
+                    pass
 
 
 long_description = """
@@ -446,7 +640,8 @@ else:
                 "-Wno-deprecated-declarations",
             ]
     else:
-        debug_compile_args = []
+        # Most Python builds compile extensions with -O2 by default
+        debug_compile_args = ["-O3"]
 
 if sys.version_info[:2] >= (3, 4) and not IS_PYSTON:
     ext_modules = [
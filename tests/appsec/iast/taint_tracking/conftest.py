@@ -0,0 +1,22 @@
+import pytest
+
+from ddtrace.appsec.iast import oce
+
+
+@pytest.fixture(autouse=True, scope="session")
+def _iast_session_init():
+    try:
+        from ddtrace.appsec.iast._taint_tracking import setup as taint_tracking_setup
+    except (ImportError, AttributeError):
+        # The test modules skip themselves on Python versions without IAST support.
+        yield
+        return
+    taint_tracking_setup(bytes.join, bytearray.join)
+    yield
+
+
+@pytest.fixture(autouse=True, scope="module")
+def _enable_oce():
+    oce._enabled = True
+    yield
+    oce._enabled = False
@@ -4,8 +4,6 @@ import sys
 
 import pytest
 
-from ddtrace.appsec.iast import oce
-
 
 try:
     from ddtrace.appsec.iast._taint_tracking import OriginType
@@ -20,7 +18,6 @@ try:
     from ddtrace.appsec.iast._taint_tracking import num_objects_tainted
     from ddtrace.appsec.iast._taint_tracking import set_fast_tainted_if_notinterned_unicode
     from ddtrace.appsec.iast._taint_tracking import set_ranges
-    from ddtrace.appsec.iast._taint_tracking import setup as taint_tracking_setup
     from ddtrace.appsec.iast._taint_tracking import shift_taint_range
     from ddtrace.appsec.iast._taint_tracking import shift_taint_ranges
     from ddtrace.appsec.iast._taint_tracking import taint_pyobject
@@ -28,11 +25,6 @@ except (ImportError, AttributeError):
     pytest.skip("IAST not supported for this Python version", allow_module_level=True)
 
 
-def setup():
-    taint_tracking_setup(bytes.join, bytearray.join)
-    oce._enabled = True
-
-
 def test_source_origin_refcount():
     s1 = Source(name="name", value="val", origin=OriginType.COOKIE)
     assert sys.getrefcount(s1) - 1 == 1  # getrefcount takes 1 while counting
@@ -1,13 +1,10 @@
 #!/usr/bin/env python3
 import pytest
 
-from ddtrace.appsec.iast import oce
-
 
 try:
     from ddtrace.appsec.iast._taint_tracking import OriginType
     from ddtrace.appsec.iast._taint_tracking import Source
-    from ddtrace.appsec.iast._taint_tracking import setup as taint_tracking_setup
     from ddtrace.appsec.iast._taint_tracking import taint_pyobject
     from ddtrace.appsec.iast._taint_tracking import taint_ranges_as_evidence_info
     from ddtrace.appsec.iast._taint_tracking.aspects import add_aspect
@@ -16,9 +13,17 @@ except (ImportError, AttributeError):
     pytest.skip("IAST not supported for this Python version", allow_module_level=True)
 
 
-def setup():
-    taint_tracking_setup(bytes.join, bytearray.join)
-    oce._enabled = True
+_TAINTED = "tainted part"
+_NOT_TAINTED = "|not tainted part|"
+
+
+@pytest.fixture(scope="module")
+def tainted_part():
+    input_info = Source("request_body", _TAINTED, OriginType.PARAMETER)
+    tainted_text = taint_pyobject(
+        _TAINTED, source_name="request_body", source_value=_TAINTED, source_origin=OriginType.PARAMETER
+    )
+    return input_info, tainted_text
 
 
 def test_taint_ranges_as_evidence_info_nothing_tainted():
@@ -39,41 +44,27 @@ def test_taint_ranges_as_evidence_info_all_tainted():
 
 
 @pytest.mark.skipif(not python_supported_by_iast(), reason="Python version not supported by IAST")
-def test_taint_ranges_as_evidence_info_tainted_op1_add():
-    arg = "tainted part"
-    input_info = Source("request_body", arg, OriginType.PARAMETER)
-    text = "|not tainted part|"
-    tainted_text = taint_pyobject(arg, source_name="request_body", source_value=arg, source_origin=OriginType.PARAMETER)
-    tainted_add_result = add_aspect(tainted_text, text)
+@pytest.mark.parametrize(
+    "operands",
+    [
+        (_TAINTED, _NOT_TAINTED),
+        (_NOT_TAINTED, _TAINTED),
+        (_TAINTED, _NOT_TAINTED, _TAINTED),
+    ],
+    ids=["op1", "op2", "same_op1_and_op3"],
+)
+def test_taint_ranges_as_evidence_info_tainted_add(tainted_part, operands):
+    input_info, tainted_text = tainted_part
+    values = [tainted_text if operand is _TAINTED else operand for operand in operands]
+    # a + (b + c)
+    tainted_add_result = values[-1]
+    for value in reversed(values[:-1]):
+        tainted_add_result = add_aspect(value, tainted_add_result)
 
     value_parts, sources = taint_ranges_as_evidence_info(tainted_add_result)
-    assert value_parts == [{"value": tainted_text, "source": 0}, {"value": text}]
-    assert sources == [input_info]
-
-
-@pytest.mark.skipif(not python_supported_by_iast(), reason="Python version not supported by IAST")
-def test_taint_ranges_as_evidence_info_tainted_op2_add():
-    arg = "tainted part"
-    input_info = Source("request_body", arg, OriginType.PARAMETER)
-    text = "|not tainted part|"
-    tainted_text = taint_pyobject(arg, source_name="request_body", source_value=arg, source_origin=OriginType.PARAMETER)
-    tainted_add_result = add_aspect(text, tainted_text)
-
-    value_parts, sources = taint_ranges_as_evidence_info(tainted_add_result)
-    assert value_parts == [{"value": text}, {"value": tainted_text, "source": 0}]
-    assert sources == [input_info]
-
-
-@pytest.mark.skipif(not python_supported_by_iast(), reason="Python version not supported by IAST")
-def test_taint_ranges_as_evidence_info_same_tainted_op1_and_op3_add():
-    arg = "tainted part"
-    input_info = Source("request_body", arg, OriginType.PARAMETER)
-    text = "|not tainted part|"
-    tainted_text = taint_pyobject(arg, source_name="request_body", source_value=arg, source_origin=OriginType.PARAMETER)
-    tainted_add_result = add_aspect(tainted_text, add_aspect(text, tainted_text))
-
-    value_parts, sources = taint_ranges_as_evidence_info(tainted_add_result)
-    assert value_parts == [{"value": tainted_text, "source": 0}, {"value": text}, {"value": tainted_text, "source": 0}]
+    assert value_parts == [
+        {"value": tainted_text, "source": 0} if operand is _TAINTED else {"value": operand} for operand in operands
+    ]
     assert sources == [input_info]
 
 
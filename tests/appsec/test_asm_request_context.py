@@ -1,6 +1,7 @@
 import pytest
 
 from ddtrace.appsec import _asm_request_context
+from ddtrace.appsec._constants import SPAN_DATA_NAMES
 from tests.utils import override_global_config
 
 
@@ -94,3 +95,45 @@ def test_asm_request_context_manager():
     assert _asm_request_context.get_headers() == {}
     assert _asm_request_context.get_value("callbacks", "block") is None
     assert not _asm_request_context.get_headers_case_sensitive()
+
+
+def test_consume_waf_addresses_updated():
+    with override_global_config({"_appsec_enabled": True}):
+        with _asm_request_context.asm_request_context_manager(_TEST_IP, _TEST_HEADERS):
+            assert _asm_request_context.consume_waf_addresses_updated()
+            assert not _asm_request_context.consume_waf_addresses_updated()
+            _asm_request_context.set_value("callbacks", "block", None)
+            assert not _asm_request_context.consume_waf_addresses_updated()
+            _asm_request_context.set_waf_address("http.request.uri", "/path")
+            assert _asm_request_context.consume_waf_addresses_updated()
+            # a change of the addresses kept by the processor also counts as an update
+            assert _asm_request_context.consume_waf_addresses_updated(1)
+            assert not _asm_request_context.consume_waf_addresses_updated(1)
+        assert not _asm_request_context.consume_waf_addresses_updated()
+
+
+def test_call_block_callable_with_args():
+    calls = []
+
+    def _callable(*args):
+        calls.append(args)
+
+    with override_global_config({"_appsec_enabled": True}):
+        with _asm_request_context.asm_request_context_manager():
+            _asm_request_context.set_block_request_callable(_callable, 1, "two")
+            _asm_request_context.block_request()
+    assert calls == [(1, "two")]
+
+
+def test_set_waf_addresses():
+    with override_global_config({"_appsec_enabled": True}):
+        with _asm_request_context.asm_request_context_manager():
+            assert _asm_request_context.consume_waf_addresses_updated()
+            _asm_request_context.set_waf_addresses(
+                {"http.request.uri": "/path", SPAN_DATA_NAMES.REQUEST_HTTP_IP: _TEST_IP}
+            )
+            assert _asm_request_context.consume_waf_addresses_updated()
+            assert _asm_request_context.get_waf_address("http.request.uri") == "/path"
+            assert _asm_request_context.get_ip() == _TEST_IP
+        _asm_request_context.set_waf_addresses({"http.request.uri": "/other"})
+        assert _asm_request_context.get_waf_address("http.request.uri") is None
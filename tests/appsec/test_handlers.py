@@ -0,0 +1,99 @@
+import json
+import threading
+
+import mock
+import pytest
+import xmltodict
+
+from ddtrace.appsec import handlers
+from tests.utils import override_global_config
+
+
+XML_BODIES = [
+    b"<root>text</root>",
+    b"<root/>",
+    b"<root>  </root>",
+    b'<?xml version="1.0" encoding="UTF-8"?><root attr="1"><a>1</a><a>2</a><b c="3"/></root>',
+    b"<root>before<a>1</a>after<!-- comment --> end</root>",
+    b'<root xmlns="urn:default" xmlns:p="urn:p"><p:a p:attr="1" xml:lang="en">x</p:a><b xmlns:q="urn:q"/></root>',
+    b"<soap:Envelope xmlns:soap='http://schemas.xmlsoap.org/soap/envelope/'>"
+    b"<soap:Body><m:Get xmlns:m='urn:m'><m:Id>1' OR '1'='1</m:Id></m:Get></soap:Body></soap:Envelope>",
+]
+
+
+@pytest.mark.skipif(handlers.lxml_etree is None, reason="lxml is not installed")
+@pytest.mark.parametrize("body", XML_BODIES)
+def test_parse_xml_body_lxml_matches_xmltodict(body):
+    request = mock.Mock(get_data=mock.Mock(return_value=body))
+
+    assert handlers._parse_xml_body(request, False) == xmltodict.parse(body)
+
+
+@pytest.mark.skipif(handlers.lxml_etree is None, reason="lxml is not installed")
+def test_parse_xml_data_lxml_parser_per_thread():
+    parser = handlers._get_lxml_parser()
+    assert handlers._get_lxml_parser() is parser
+
+    with pytest.raises(handlers.XMLSyntaxError):
+        handlers._parse_xml_data(b"<root>")
+    # the parser is still usable after an error
+    assert handlers._parse_xml_data(b"<root>text</root>") == {"root": "text"}
+
+    parsers = []
+    thread = threading.Thread(target=lambda: parsers.append(handlers._get_lxml_parser()))
+    thread.start()
+    thread.join()
+    assert parsers[0] is not parser
+
+
+@pytest.mark.parametrize("body", XML_BODIES)
+def test_parse_xml_body_without_lxml(body):
+    request = mock.Mock(get_data=mock.Mock(return_value=body))
+
+    with mock.patch.object(handlers, "lxml_etree", None):
+        assert handlers._parse_xml_body(request, False) == xmltodict.parse(body)
+
+
+JSON_BODIES = [
+    b'{"key": "value", "list": [1, 2.5, null, true]}',
+    b'{"nan": NaN, "big": 123456789012345678901234567890}',
+    '{"unicode": "éè"}'.encode("UTF-8"),
+]
+
+
+@pytest.mark.parametrize("body", JSON_BODIES)
+def test_parse_json_body(body):
+    request = mock.Mock(data=body)
+
+    expected = json.loads(body.decode("UTF-8"))
+    assert repr(handlers._parse_json_body(request, False)) == repr(expected)
+    with mock.patch.object(handlers, "orjson_loads", None):
+        assert repr(handlers._parse_json_body(request, False)) == repr(expected)
+
+
+def test_parse_json_data_ignore_decoding_errors():
+    assert handlers._parse_json_data(b'{"key": "va\xfflue"}', errors="ignore") == {"key": "value"}
+    with pytest.raises(ValueError):
+        handlers._parse_json_data(b'{"key": "va\xfflue"}')
+
+
+@pytest.mark.parametrize("lxml", [True, False])
+def test_parse_xml_data_ignore_decoding_errors(lxml):
+    if lxml and handlers.lxml_etree is None:
+        pytest.skip("lxml is not installed")
+    with mock.patch.object(handlers, "lxml_etree", handlers.lxml_etree if lxml else None):
+        assert handlers._parse_xml_data(b"<key>va\xfflue</key>", errors="ignore") == {"key": "value"}
+        with pytest.raises(handlers._BODY_PARSE_ERRORS):
+            handlers._parse_xml_data(b"<key>va\xfflue</key>")
+
+
+class _FrameworkError(Exception):
+    pass
+
+
+@pytest.mark.parametrize("exception", [_FrameworkError, ValueError])
+def test_on_request_span_modifier_parse_error(exception):
+    request = mock.Mock(method="POST", content_type="application/xml", get_data=mock.Mock(side_effect=exception))
+
+    with override_global_config({"_appsec_enabled": True}):
+        assert handlers._on_request_span_modifier(request, {}, False, _FrameworkError) is None
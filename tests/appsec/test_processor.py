@@ -9,6 +9,8 @@ from six import ensure_binary
 from ddtrace.appsec import _asm_request_context
 from ddtrace.appsec._constants import APPSEC
 from ddtrace.appsec._constants import DEFAULT
+from ddtrace.appsec._constants import SPAN_DATA_NAMES
+from ddtrace.appsec._constants import WAF_DATA_NAMES
 from ddtrace.appsec.ddwaf import DDWaf
 from ddtrace.appsec.processor import AppSecSpanProcessor
 from ddtrace.appsec.processor import _transform_headers
@@ -72,6 +74,15 @@ def test_transform_headers():
     assert set(transformed["foo"]) == {"bar1", "bar2", "bar3"}
 
 
+def test_transform_headers_lowercase_cache_is_bounded():
+    from ddtrace.appsec import processor
+
+    with mock.patch.object(processor, "_LOWER_HEADERS_CACHE", {}) as cache:
+        for i in range(processor._LOWER_HEADERS_CACHE_MAX_SIZE + 10):
+            assert _transform_headers({"X-Header-%d" % i: "value"}) == {"x-header-%d" % i: "value"}
+            assert len(cache) <= processor._LOWER_HEADERS_CACHE_MAX_SIZE
+
+
 def test_enable(tracer_appsec):
     tracer = tracer_appsec
 
@@ -298,6 +309,43 @@ def test_ip_update_rules_expired_no_block(tracer):
             assert core.get_item("http.request.blocked", span) is None
 
 
+def test_update_rules_sends_address_set_before_it_was_needed(tracer):
+    with override_global_config(dict(_appsec_enabled=True)):
+        _enable_appsec(tracer)
+        processor = tracer._appsec_processor
+        assert not processor._is_needed(WAF_DATA_NAMES.REQUEST_METHOD)
+        with _asm_request_context.asm_request_context_manager(_ALLOWED_IP, {}):
+            with tracer.trace("test", span_type=SpanTypes.WEB):
+                _asm_request_context.set_waf_address(SPAN_DATA_NAMES.REQUEST_METHOD, "GET")
+                _asm_request_context.call_waf_callback()
+                assert "REQUEST_METHOD" not in _asm_request_context.get_data_sent()
+
+                assert processor._update_rules(
+                    {
+                        "rules": [
+                            {
+                                "id": "method-rule",
+                                "name": "method rule",
+                                "tags": {"type": "method", "category": "attack_attempt"},
+                                "conditions": [
+                                    {
+                                        "operator": "match_regex",
+                                        "parameters": {
+                                            "inputs": [{"address": WAF_DATA_NAMES.REQUEST_METHOD}],
+                                            "regex": "^TRACE$",
+                                        },
+                                    }
+                                ],
+                            }
+                        ]
+                    }
+                )
+                assert processor._is_needed(WAF_DATA_NAMES.REQUEST_METHOD)
+                # no address was set since the last run, the one that became needed must still be sent
+                _asm_request_context.call_waf_callback()
+                assert "REQUEST_METHOD" in _asm_request_context.get_data_sent()
+
+
 @snapshot(
     include_tracer=True,
     ignores=[
@@ -661,11 +709,11 @@ def test_asm_context_registration(tracer_appsec):
 
     # For a web type span, a context manager is added, but then removed
     with tracer.trace("test", span_type=SpanTypes.WEB) as span:
-        assert core.get_item("asm_env") is not None
-    assert core.get_item("asm_env") is None
+        assert _asm_request_context.in_context()
+    assert not _asm_request_context.in_context()
 
     # Regression test, if the span type changes after being created, we always removed
     with tracer.trace("test", span_type=SpanTypes.WEB) as span:
         span.span_type = SpanTypes.HTTP
-        assert core.get_item("asm_env") is not None
-    assert core.get_item("asm_env") is None
+        assert _asm_request_context.in_context()
+    assert not _asm_request_context.in_context()
@@ -230,6 +230,22 @@ def test_django_request_body_xml_attack(client, test_spans, tracer):
             assert query == {"attack": "1' or '1' = '1'"}
 
 
+def test_django_request_body_xml_invalid_utf8(client, test_spans, tracer):
+    with override_global_config(dict(_appsec_enabled=True)):
+        root_span, response = _aux_appsec_get_root_span(
+            client,
+            test_spans,
+            tracer,
+            payload=b"<mytestingbody_key>mytestingbody_\xffvalue</mytestingbody_key>",
+            content_type="application/xml",
+        )
+
+        # the bytes that are not valid UTF-8 are ignored, the rest of the body is still inspected
+        query = dict(core.get_item("http.request.body", span=root_span))
+        assert response.status_code == 200
+        assert query == {"mytestingbody_key": "mytestingbody_value"}
+
+
 def test_django_request_body_plain(client, test_spans, tracer):
     with override_global_config(dict(_appsec_enabled=True)):
         root_span, _ = _aux_appsec_get_root_span(client, test_spans, tracer, payload="foo=bar")
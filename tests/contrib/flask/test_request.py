@@ -8,6 +8,7 @@ from flask import jsonify
 from flask import make_response
 import pytest
 
+from ddtrace import Pin
 from ddtrace.constants import ANALYTICS_SAMPLE_RATE_KEY
 from ddtrace.constants import ERROR_MSG
 from ddtrace.contrib.flask.patch import flask_version
@@ -107,6 +108,28 @@ class FlaskRequestTestCase(BaseFlaskTestCase):
         self.assertEqual(handler_span.resource, "/")
         self.assertEqual(req_span.error, 0)
 
+    def test_request_reuses_wsgi_middleware(self):
+        """
+        When making several requests
+            We build the WSGI middleware once and rebuild it when the pin changes
+        """
+
+        @self.app.route("/")
+        def index():
+            return "Hello Flask", 200
+
+        self.client.get("/")
+        middleware = self.app._dd_wsgi_middleware
+        self.client.get("/")
+        assert self.app._dd_wsgi_middleware is middleware
+
+        Pin.override(self.app, tracer=self.tracer)
+        res = self.client.get("/")
+        self.assertEqual(res.status_code, 200)
+        assert self.app._dd_wsgi_middleware is not middleware
+        assert self.app._dd_wsgi_middleware._pin is Pin.get_from(self.app)
+        assert len([s for s in self.get_spans() if s.name == "flask.request"]) == 3
+
     def test_route_params_request(self):
         """
         When making a request to an endpoint with non-string url params
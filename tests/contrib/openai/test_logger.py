@@ -1,4 +1,7 @@
+from collections import deque
+import json
 import os
+import threading
 import time
 
 import mock
@@ -58,6 +61,44 @@ def test_buffer_limit(mock_logs):
     assert len(logger._buffer) == 1000
 
 
+def test_periodic_sends_at_most_buffer_limit(mock_logs):
+    logger = V2LogWriter(site="datadoghq.com", api_key="asdf", interval=1000, timeout=1)
+    # concurrent enqueues can overshoot the limit
+    logger._buffer.extend({} for _ in range(1005))
+    with mock.patch("ddtrace.internal.log_writer.httplib.HTTPSConnection") as conn:
+        conn.return_value.getresponse.return_value.status = 202
+        logger.periodic()
+    mock_logs.debug.assert_called_with("sent %d logs to %r", 1000, "https://http-intake.logs.datadoghq.com/api/v2/logs")
+    assert len(logger._buffer) == 5
+
+
+def test_periodic_concurrent_drains(mock_logs):
+    logger = V2LogWriter(site="datadoghq.com", api_key="asdf", interval=1000, timeout=1)
+
+    class _Buffer(deque):
+        concurrent_drain = None
+
+        def popleft(self):
+            if self.concurrent_drain is None:
+                # another thread, e.g. the one running on_shutdown, drains the buffer during this drain
+                self.concurrent_drain = threading.Thread(target=logger.periodic)
+                self.concurrent_drain.start()
+                self.concurrent_drain.join()
+            return super(_Buffer, self).popleft()
+
+    logger._buffer = _Buffer({"message": str(i)} for i in range(10))
+    with mock.patch("ddtrace.internal.log_writer.httplib.HTTPSConnection") as conn:
+        conn.return_value.getresponse.return_value.status = 202
+        logger.periodic()
+
+    # every log is sent exactly once, and the drain that found the buffer empty sent nothing
+    assert conn.return_value.request.call_count == 1
+    sent = json.loads(conn.return_value.request.call_args[0][2])
+    assert sent == [{"message": str(i)} for i in range(10)]
+    assert not logger._buffer
+    mock_logs.error.assert_not_called()
+
+
 @pytest.mark.vcr_logs
 def test_send_log(mock_logs):
     logger = V2LogWriter(site="datadoghq.com", api_key=os.getenv("DD_API_KEY"), interval=1, timeout=1)
@@ -1,11 +1,12 @@
 import os
 import subprocess
+import sys
 
 
 def test_mypackage_example(mypackage_example):
-    git_sha = subprocess.check_output("git rev-parse HEAD", shell=True).decode("utf-8").strip()
+    git_sha = subprocess.check_output(["git", "rev-parse", "HEAD"]).decode("utf-8").strip()
     expected = "Project-URL: source_code_link, https://github.com/companydotcom/repo#{}".format(git_sha)
-    subprocess.check_output("python setup.py bdist", shell=True)
+    subprocess.check_output([sys.executable, "setup.py", "egg_info"])
     pkg_info = os.path.join(
         mypackage_example,
         "mypackage.egg-info",
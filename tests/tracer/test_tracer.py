@@ -1916,6 +1916,7 @@ def test_ctx_api():
     with tracer.trace("root") as span:
         v = core.get_item("my.val")
         assert v is None
+        assert core.get_items(["appsec.key", "appsec.key2"], span=span) == [None, None]
 
         core.set_item("appsec.key", "val", span=span)
         core.set_items({"appsec.key2": "val2", "appsec.key3": "val3"}, span=span)